@@ -0,0 +1,316 @@
+import json
+import os
+import sys
+import threading
+import time
+import wave
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Ambient layers in each pre-mixed bed; the gain key names the config volume
+BED_LAYERS = {
+    "clear": [("rainforest.mp3", "background"), ("wind.mp3", "background")],
+    "rain": [("rainforest.mp3", "background"), ("wind.mp3", "background"), ("rain.wav", "rain")]
+}
+
+# Leave a little headroom below int16 full scale
+PEAK_LIMIT = 0.95
+
+# Bump when the mixing changes so cached beds are rebuilt
+MIX_VERSION = 2
+
+# Volume steps per second while crossfading between beds
+FADE_STEPS_PER_SECOND = 20
+
+
+def make_loop(samples, crossfade):
+    """Fold the tail into the head with a power-preserving crossfade so it loops without a click"""
+    crossfade = min(crossfade, len(samples) // 4)
+    if crossfade <= 0:
+        return samples
+    body = samples[:len(samples) - crossfade].copy()
+    head = body[:crossfade]
+    tail = samples[len(samples) - crossfade:]
+    ramp = np.linspace(0.0, np.pi / 2, crossfade, dtype=np.float32)[:, None]
+    fade_in, fade_out = np.sin(ramp), np.cos(ramp)
+    # Equal-power gains only hold for uncorrelated material; correct for the
+    # correlation so similar head and tail don't swell in the middle
+    energy = float(np.sqrt(np.sum(head * head) * np.sum(tail * tail)))
+    correlation = max(0.0, float(np.sum(head * tail)) / energy) if energy else 1.0
+    gain = 1.0 / np.sqrt(1.0 + 2.0 * correlation * fade_in * fade_out)
+    body[:crossfade] = (head * fade_in + tail * fade_out) * gain
+    return body
+
+
+def fit_loop(loop, length, crossfade):
+    """Repeat a seamless loop to exactly `length` samples, crossfading the cut"""
+    if length % len(loop) == 0:
+        return np.tile(loop, (length // len(loop), 1))
+    crossfade = min(crossfade, length // 3)
+    reps = -(-(length + crossfade) // len(loop))
+    return make_loop(np.tile(loop, (reps, 1))[:length + crossfade], crossfade)
+
+
+def mix_loops(loops, length, crossfade):
+    """Sum (loop, gain) pairs of seamless loops into one loop of `length` samples"""
+    # Each layer loops at exactly the bed length, so the bed needs no fold of its own
+    bed = np.zeros((length, loops[0][0].shape[1]), dtype=np.float32)
+    for loop, gain in loops:
+        bed += fit_loop(loop, length, crossfade) * gain
+    return bed
+
+
+def mix_layers(layers, crossfade):
+    """Sum (samples, gain) layers into one seamless loop as long as the longest layer"""
+    loops = [(make_loop(samples, crossfade), gain) for samples, gain in layers]
+    return mix_loops(loops, max(len(loop) for loop, _ in loops), crossfade)
+
+
+def _source_info(paths):
+    info = {}
+    for path in paths:
+        stat = os.stat(path)
+        info[os.path.abspath(path)] = [stat.st_size, int(stat.st_mtime)]
+    return info
+
+
+def _decode(path):
+    """Decode a sound file at the current mixer format as float32 in [-1, 1]"""
+    samples = pygame.sndarray.array(pygame.mixer.Sound(path)).astype(np.float32) / 32768.0
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    return samples
+
+
+def _write_wav(path, samples, frequency):
+    data = np.clip(samples * 32767.0, -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(data.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(frequency)
+        f.writeframes(data.tobytes())
+
+
+class AmbientBed:
+    """One pre-mixed looping ambient buffer per weather state
+
+    Replaces the separately looping rainforest/wind/rain channels with one
+    channel per state. All beds have the same length and play together from
+    the start, the inactive ones at volume 0, so a weather change is only a
+    volume crossfade and the shared layers never jump back to the beginning.
+    """
+
+    def __init__(self, sound_dir, cache_dir="ambient_cache", background_volume=0.3,
+                 rain_volume=0.5, include_rain=True, loop_crossfade=2.0, log=None):
+        self.sound_dir = sound_dir
+        self.cache_dir = cache_dir
+        self.gains = {"background": background_volume, "rain": rain_volume}
+        self.loop_crossfade = loop_crossfade
+        self.log = log or (lambda message: None)
+        # Like the layered playback, missing sound files are simply left out
+        self.beds = {}
+        for name, layers in BED_LAYERS.items():
+            if name == "rain" and not include_rain:
+                continue
+            layers = [(filename, gain) for filename, gain in layers
+                      if os.path.exists(os.path.join(sound_dir, filename))]
+            if layers:
+                self.beds[name] = layers
+        self.sounds = {}
+        self.channels = {}
+        self.state = "clear"
+        self.fade_id = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        return np is not None and bool(pygame.mixer.get_init())
+
+    def has_sources(self):
+        return "clear" in self.beds
+
+    def ready(self):
+        return bool(self.sounds)
+
+    def _sources(self, name):
+        return [(os.path.join(self.sound_dir, filename), gain) for filename, gain in self.beds[name]]
+
+    def _manifest(self):
+        paths = {path for name in self.beds for path, _ in self._sources(name)}
+        return {
+            "version": MIX_VERSION,
+            "mixer": list(pygame.mixer.get_init()),
+            "gains": self.gains,
+            "loop_crossfade": self.loop_crossfade,
+            "beds": sorted(self.beds),
+            "sources": _source_info(paths)
+        }
+
+    def _bed_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.wav")
+
+    def _cache_current(self, manifest):
+        manifest_path = os.path.join(self.cache_dir, "manifest.json")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return cached == manifest and all(os.path.exists(self._bed_path(name)) for name in self.beds)
+
+    def build(self, force=False):
+        """Mix every bed into the cache directory (skipped when already current)"""
+        manifest = self._manifest()
+        if not force and self._cache_current(manifest):
+            return False
+
+        frequency, _, _ = pygame.mixer.get_init()
+        crossfade = int(self.loop_crossfade * frequency)
+        loops = {}
+        for name in self.beds:
+            for path, _ in self._sources(name):
+                if path not in loops:
+                    loops[path] = make_loop(_decode(path), crossfade)
+        # One length for every bed keeps the shared layers in phase across beds
+        length = max(len(loop) for loop in loops.values())
+        mixed = {
+            name: mix_loops([(loops[path], self.gains[gain]) for path, gain in self._sources(name)],
+                            length, crossfade)
+            for name in self.beds
+        }
+        loops.clear()
+
+        # One shared scale keeps the rain bed louder than the clear bed
+        peak = max(float(np.abs(bed).max()) for bed in mixed.values())
+        scale = PEAK_LIMIT / peak if peak > PEAK_LIMIT else 1.0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for name, bed in mixed.items():
+            _write_wav(self._bed_path(name), bed * scale, frequency)
+        with open(os.path.join(self.cache_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        self.log(f"Pre-mixed ambient beds: {', '.join(sorted(mixed))}")
+        return True
+
+    def load(self):
+        """Load cached beds if they match the current sources; True when ready"""
+        try:
+            if not self._cache_current(self._manifest()):
+                return False
+            sounds = {name: pygame.mixer.Sound(self._bed_path(name)) for name in self.beds}
+        except (OSError, pygame.error) as e:
+            self.log(f"Error loading ambient beds: {e}")
+            return False
+        with self.lock:
+            self.sounds = sounds
+        return True
+
+    def build_in_background(self, on_ready=None):
+        """Mix and load the beds off the calling thread"""
+        def worker():
+            try:
+                self.build()
+                if self.load() and on_ready:
+                    on_ready()
+            except Exception as e:
+                self.log(f"Ambient pre-mix failed: {e}")
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def _start(self):
+        # Called with the lock held: start every bed silent, back to back
+        for name, sound in self.sounds.items():
+            channel = pygame.mixer.find_channel(True)
+            channel.set_volume(0.0)
+            channel.play(sound, loops=-1)
+            self.channels[name] = channel
+
+    def _fade_to(self, state, fade_ms):
+        # Called with the lock held; a newer fade cancels this one
+        self.fade_id += 1
+        fade_id = self.fade_id
+        start = {name: channel.get_volume() for name, channel in self.channels.items()}
+        steps = max(1, int(fade_ms / 1000 * FADE_STEPS_PER_SECOND))
+
+        def worker():
+            for step in range(1, steps + 1):
+                time.sleep(fade_ms / 1000 / steps)
+                with self.lock:
+                    if fade_id != self.fade_id:
+                        return
+                    # Linear gains: the beds share layers, so their sum stays level
+                    for name, channel in self.channels.items():
+                        target = 1.0 if name == state else 0.0
+                        channel.set_volume(start[name] + (target - start[name]) * step / steps)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def set_state(self, raining, fade_ms=5000):
+        """Crossfade to the bed for the new weather; remembered until ready"""
+        state = "rain" if raining and "rain" in self.beds else "clear"
+        with self.lock:
+            if state == self.state and self.channels:
+                return
+            self.state = state
+            if not self.sounds:
+                return
+            if not self.channels:
+                self._start()
+            self._fade_to(state, fade_ms)
+
+    def play(self, fade_ms=2000):
+        """Start the beds, fading in the one for the current state"""
+        with self.lock:
+            if self.sounds and not self.channels:
+                self._start()
+                self._fade_to(self.state, fade_ms)
+
+    def stop(self):
+        with self.lock:
+            self.fade_id += 1
+            for channel in self.channels.values():
+                channel.stop()
+            self.channels = {}
+
+
+def create_ambient_bed(config, sound_dir, log=None):
+    """Build an AmbientBed from the [AUDIO] config section, or None if disabled"""
+    if not config.getboolean('AUDIO', 'premix_ambient', fallback=True) or not AmbientBed.available():
+        return None
+    bed = AmbientBed(
+        sound_dir,
+        cache_dir=config.get('AUDIO', 'ambient_cache_dir', fallback='ambient_cache'),
+        background_volume=config.getfloat('AUDIO', 'background_volume', fallback=0.3),
+        rain_volume=config.getfloat('AUDIO', 'rain_volume', fallback=0.5),
+        include_rain=config.getboolean('AUDIO', 'enable_rain_sounds', fallback=True),
+        loop_crossfade=config.getfloat('AUDIO', 'ambient_loop_crossfade', fallback=2.0),
+        log=log
+    )
+    return bed if bed.has_sources() else None
+
+
+if __name__ == "__main__":
+    # Usage: python ambient_mix.py [sound_dir] -- pre-mix the beds ahead of time
+    import configparser
+
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    if np is None:
+        print("NumPy is required to pre-mix ambient beds")
+        sys.exit(1)
+    pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
+    pygame.mixer.init()
+    sound_dir = sys.argv[1] if len(sys.argv) > 1 else config.get('PATHS', 'sound_dir', fallback='sounds')
+    bed = create_ambient_bed(config, sound_dir, log=print)
+    if bed is None:
+        print(f"Ambient pre-mix disabled or no ambient sounds found in {sound_dir}")
+        sys.exit(1)
+    if not bed.build():
+        print("Ambient beds already up to date")
@@ -0,0 +1,279 @@
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _windows_memory():
+    """Working set of this process via GetProcessMemoryInfo"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t)
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return {}
+    return {"rss_bytes": counters.WorkingSetSize, "peak_rss_bytes": counters.PeakWorkingSetSize}
+
+
+def memory_usage():
+    """Current resident memory in bytes (peak only when using resource)"""
+    if psutil:
+        return {"rss_bytes": psutil.Process().memory_info().rss}
+    if sys.platform == "win32":
+        try:
+            return _windows_memory()
+        except (OSError, AttributeError):
+            return {}
+    if resource:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return {"peak_rss_bytes": peak if sys.platform == "darwin" else peak * 1024}
+    return {}
+
+
+class Metrics:
+    """Thread-safe rolling frame and call-latency metrics"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.frame_times = deque(maxlen=window)
+        self.frame_stamps = deque(maxlen=window)
+        self.calls = defaultdict(lambda: deque(maxlen=window))
+        self.call_counts = defaultdict(int)
+        self.started = time.monotonic()
+
+    def record_frame(self, frame_time):
+        with self.lock:
+            self.frame_times.append(frame_time)
+            self.frame_stamps.append(time.monotonic())
+
+    def record_call(self, name, latency):
+        with self.lock:
+            self.calls[name].append(latency)
+            self.call_counts[name] += 1
+
+    def _summary(self, values):
+        ordered = sorted(values)
+        return {
+            "count": len(ordered),
+            "p50_ms": None if not ordered else percentile(ordered, 0.50) * 1000,
+            "p95_ms": None if not ordered else percentile(ordered, 0.95) * 1000,
+            "p99_ms": None if not ordered else percentile(ordered, 0.99) * 1000,
+            "max_ms": None if not ordered else ordered[-1] * 1000
+        }
+
+    def snapshot(self):
+        with self.lock:
+            frame_times = list(self.frame_times)
+            stamps = list(self.frame_stamps)
+            calls = {name: list(values) for name, values in self.calls.items()}
+            counts = dict(self.call_counts)
+
+        fps = None
+        if len(stamps) > 1 and stamps[-1] > stamps[0]:
+            fps = (len(stamps) - 1) / (stamps[-1] - stamps[0])
+
+        livelycu = {}
+        for name, values in calls.items():
+            livelycu[name] = self._summary(values)
+            livelycu[name]["total"] = counts[name]
+
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "fps": fps,
+            "frame_time": self._summary(frame_times),
+            "livelycu": livelycu,
+            "memory": memory_usage()
+        }
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    # On Windows SO_REUSEADDR lets a second instance bind the same port silently
+    allow_reuse_address = sys.platform != "win32"
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+def _remove_stale_socket(path):
+    """Remove a leftover Unix socket file, refusing anything else or a live server"""
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.remove(path)  # Nobody listening: left over from a crashed instance
+    else:
+        raise OSError(f"Another instance is already listening on {path}")
+    finally:
+        probe.close()
+
+
+class ControlServer:
+    """Line-delimited JSON control endpoint on localhost TCP or a Unix socket
+
+    Each request is one JSON object such as {"command": "metrics"} or
+    {"command": "force", "args": ["day_rain"]}; each reply is one JSON line.
+    """
+
+    def __init__(self, commands, host="127.0.0.1", port=8766, socket_path=None, log=None):
+        self.commands = commands
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.log = log or (lambda message: None)
+        self.server = None
+        self.thread = None
+
+    def handle(self, request):
+        """Dispatch one decoded request and return the reply dict"""
+        name = request.get("command") if isinstance(request, dict) else None
+        handler = self.commands.get(name)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command: {name}",
+                    "commands": sorted(self.commands)}
+        try:
+            return {"ok": True, "result": handler(*request.get("args", []))}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def start(self):
+        control = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        reply = control.handle(json.loads(line))
+                    except ValueError as e:
+                        reply = {"ok": False, "error": f"Invalid JSON: {e}"}
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+        if self.socket_path and _UnixServer is not None:
+            _remove_stale_socket(self.socket_path)
+            self.server = _UnixServer(self.socket_path, Handler)
+        else:
+            self.server = _TCPServer((self.host, self.port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.log(f"Control server listening on {self.address()}")
+
+    def address(self):
+        if self.server is None:
+            return None
+        if isinstance(self.server.server_address, tuple):
+            host, port = self.server.server_address[:2]
+            return f"{host}:{port}"
+        return self.server.server_address
+
+    def stop(self):
+        if self.server:
+            unix_socket = not isinstance(self.server.server_address, tuple)
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            # Only remove the socket file this server created
+            if unix_socket and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def create_control_server(config, commands, log=None):
+    """Build a ControlServer from the [CONTROL] config section, or None if disabled"""
+    if not config.getboolean('CONTROL', 'enable_control', fallback=False):
+        return None
+    return ControlServer(
+        commands,
+        host=config.get('CONTROL', 'host', fallback='127.0.0.1'),
+        port=config.getint('CONTROL', 'port', fallback=8766),
+        socket_path=config.get('CONTROL', 'socket_path', fallback='') or None,
+        log=log
+    )
+
+
+def send_command(command, args=(), host="127.0.0.1", port=8766, socket_path=None, timeout=5):
+    """Send one command to a running instance and return its reply"""
+    if socket_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = socket_path
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = (host, port)
+    with sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall((json.dumps({"command": command, "args": list(args)}) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as reply:
+            return json.loads(reply.readline())
+
+
+if __name__ == "__main__":
+    # Usage: python control_server.py <command> [args...]
+    # e.g.   python control_server.py metrics
+    #        python control_server.py force day_rain
+    import configparser
+
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    if len(sys.argv) < 2:
+        print("Usage: python control_server.py <command> [args...]")
+        sys.exit(1)
+    reply = send_command(
+        sys.argv[1], sys.argv[2:],
+        host=config.get('CONTROL', 'host', fallback='127.0.0.1'),
+        port=config.getint('CONTROL', 'port', fallback=8766),
+        socket_path=config.get('CONTROL', 'socket_path', fallback='') or None
+    )
+    print(json.dumps(reply, indent=2))
+    sys.exit(0 if reply.get("ok") else 1)
@@ -1,4 +1,3 @@
-import time
 import random
 import subprocess
 import threading
@@ -6,7 +5,11 @@ import os
 import pygame
 import sys
 import configparser
-from datetime import datetime
+from weather_provider import create_weather_service
+from weather_graph import WeatherGraph
+from control_server import Metrics, create_control_server
+from virtual_clock import SystemClock
+from ambient_mix import create_ambient_bed
 
 class AdaptiveWallpaperConfig:
     def __init__(self, config_file="config.ini"):
@@ -40,10 +43,33 @@ class AdaptiveWallpaperConfig:
             'music_volume': '0.1',
             'rain_fade_steps': '20',
             'rain_fade_delay': '0.25',
+            'rain_volume': '0.5',
+            'premix_ambient': 'true',
+            'ambient_cache_dir': 'ambient_cache',
+            'ambient_loop_crossfade': '2.0',
             'enable_background_sounds': 'true',
             'enable_music': 'true',
             'enable_rain_sounds': 'true'
         }
+        self.config['WEATHER'] = {
+            'provider': 'none',
+            'file_path': 'weather.json',
+            'url': 'http://127.0.0.1:8765/weather',
+            'request_timeout': '5',
+            'first_fetch_timeout': '5',
+            'cache_file': 'weather_cache.json',
+            'cache_ttl': '600',
+            'max_cache_age': '3600',
+            'refresh_interval': '300',
+            'retry_delay': '15',
+            'max_backoff': '1800'
+        }
+        self.config['CONTROL'] = {
+            'enable_control': 'false',
+            'host': '127.0.0.1',
+            'port': '8766',
+            'socket_path': ''
+        }
         self.config['DEBUG'] = {
             'verbose_logging': 'true',
             'show_status_updates': 'true',
@@ -64,13 +90,20 @@ class AdaptiveWallpaperConfig:
         return self.config.getfloat(section, key, fallback=fallback)
 
 class AdaptiveWallpaper:
-    def __init__(self, config_file="config.ini"):
+    def __init__(self, config_file="config.ini", clock=None, rng=None, runner=None):
+        self.config_file = config_file
+        # Injectable time, randomness and process launching (see soak.py)
+        self.clock = clock or SystemClock()
+        self.rng = rng or random
+        self.runner = runner or subprocess.run
         self.config = AdaptiveWallpaperConfig(config_file)
         self.run = True
+        self.paused = False
         self.current_weather = ""
         self.time_window = ""
         self.rain_playing = False
         self.rain_sound = None
+        self.ambient_bed = None
         self.background_sounds = []
         self.music_playlist = []
         self.current_music_index = 0
@@ -80,8 +113,31 @@ class AdaptiveWallpaper:
         self.wallpaper_dir = self.config.get('PATHS', 'wallpaper_dir')
         self.sound_dir = self.config.get('PATHS', 'sound_dir')
         
+        # Weather states, transitions and clip durations
+        self.weather_graph = WeatherGraph(
+            self.wallpaper_dir,
+            default_duration=self.config.getfloat('TIMING', 'transition_duration')
+        )
+        
         # Initialize smooth transition tracking
         self.last_video_path = None
+        # When the current clip started playing (setwp/seekwp returned)
+        self.clip_started = None
+        
+        # Real weather provider (None keeps the random simulation)
+        self.weather_service = create_weather_service(self.config, clock=self.clock, log=self.log)
+        
+        # Live metrics and the optional control socket
+        self.metrics = Metrics()
+        self.control_server = create_control_server(self.config, {
+            "status": self.status,
+            "metrics": self.metrics_snapshot,
+            "force": self.force_weather,
+            "pause": self.pause,
+            "resume": self.resume,
+            "reload": self.reload_config,
+            "refresh": self.refresh_weather
+        }, log=self.log)
         
         # Initialize audio if enabled
         if self._audio_enabled():
@@ -96,9 +152,18 @@ class AdaptiveWallpaper:
     def log(self, message):
         """Log message if verbose logging is enabled"""
         if self.config.getboolean('DEBUG', 'verbose_logging'):
-            timestamp = datetime.now().strftime("%H:%M:%S")
+            timestamp = self.clock.now().strftime("%H:%M:%S")
             print(f"[{timestamp}] {message}")
 
+    def livelycu(self, *args, timeout=5, check=False):
+        """Run a livelycu command, recording its latency"""
+        started = self.clock.monotonic()
+        try:
+            return self.runner([self.livelycu_path, *args],
+                               capture_output=True, text=True, check=check, timeout=timeout)
+        finally:
+            self.metrics.record_call(args[0], self.clock.monotonic() - started)
+
     def init_audio(self):
         """Initialize pygame audio system"""
         try:
@@ -106,8 +171,15 @@ class AdaptiveWallpaper:
             pygame.mixer.init()
             self.log("Audio system initialized")
             
-            # Load background sounds
+            # Prefer one pre-mixed ambient bed per weather state over layered channels
             if self.config.getboolean('AUDIO', 'enable_background_sounds'):
+                self.ambient_bed = create_ambient_bed(self.config, self.sound_dir, log=self.log)
+                if self.ambient_bed and self.ambient_bed.load():
+                    self.ambient_bed.play()
+                    self.log("Playing pre-mixed ambient bed")
+            
+            # Load background sounds until the pre-mixed bed is ready
+            if self.config.getboolean('AUDIO', 'enable_background_sounds') and not self._ambient_ready():
                 background_files = [
                     os.path.join(self.sound_dir, "rainforest.mp3"),
                     os.path.join(self.sound_dir, "wind.mp3")
@@ -123,9 +195,13 @@ class AdaptiveWallpaper:
                             self.log(f"Playing background sound: {sound_file}")
                         except pygame.error as e:
                             self.log(f"Error loading background sound {sound_file}: {e}")
+                
+                if self.ambient_bed:
+                    self.ambient_bed.build_in_background(on_ready=self._switch_to_ambient_bed)
+                    self.log("Pre-mixing ambient bed in the background")
             
-            # Load rain sound
-            if self.config.getboolean('AUDIO', 'enable_rain_sounds'):
+            # Load rain sound unless it is part of the ambient bed
+            if self.config.getboolean('AUDIO', 'enable_rain_sounds') and not self._ambient_rain():
                 rain_file = os.path.join(self.sound_dir, "rain.wav")
                 if os.path.exists(rain_file):
                     try:
@@ -138,7 +214,7 @@ class AdaptiveWallpaper:
             if self.config.getboolean('AUDIO', 'enable_music'):
                 music_files = [os.path.join(self.sound_dir, f"track{i}.mp3") for i in range(1, 8)]
                 self.music_playlist = [f for f in music_files if os.path.exists(f)]
-                random.shuffle(self.music_playlist)
+                self.rng.shuffle(self.music_playlist)
                 
                 if self.music_playlist:
                     volume = self.config.getfloat('AUDIO', 'music_volume')
@@ -149,9 +225,34 @@ class AdaptiveWallpaper:
             self.log(f"Audio initialization failed: {e}")
             self.log("Running without audio...")
 
+    def _ambient_ready(self):
+        return bool(self.ambient_bed and self.ambient_bed.ready())
+
+    def _ambient_rain(self):
+        """True when rain is mixed into the ambient bed instead of its own channel"""
+        return self._ambient_ready() and "rain" in self.ambient_bed.beds
+
+    def _switch_to_ambient_bed(self):
+        """Replace the layered background channels once the pre-mixed bed is ready"""
+        fade_ms = 2000
+        for sound in self.background_sounds:
+            sound.fadeout(fade_ms)
+        self.background_sounds = []
+        if self._ambient_rain() and self.rain_sound:
+            self.rain_sound.fadeout(fade_ms)
+            self.rain_sound = None
+        # The bed already tracks the weather requested while it was mixing
+        self.ambient_bed.play(fade_ms)
+        self.log("Switched to pre-mixed ambient bed")
+
+    def _rain_fade_ms(self):
+        fade_steps = self.config.getint('AUDIO', 'rain_fade_steps')
+        fade_delay = self.config.getfloat('AUDIO', 'rain_fade_delay')
+        return int(fade_steps * fade_delay * 1000)
+
     def get_time_window(self):
         """Get current time window based on hour"""
-        hour = datetime.now().hour
+        hour = self.clock.now().hour
         morning_start = self.config.getint('TIMING', 'morning_start')
         day_start = self.config.getint('TIMING', 'day_start')
         evening_start = self.config.getint('TIMING', 'evening_start')
@@ -171,9 +272,8 @@ class AdaptiveWallpaper:
         try:
             # Fade out wallpaper volume for smoother transition
             try:
-                subprocess.run([self.livelycu_path, "app", "--volume", "0"], 
-                             capture_output=True, text=True, timeout=3)
-                time.sleep(0.1)
+                self.livelycu("app", "--volume", "0", timeout=3)
+                self.clock.sleep(0.1)
             except:
                 pass
             
@@ -182,8 +282,7 @@ class AdaptiveWallpaper:
             
             # Fade volume back in
             try:
-                subprocess.run([self.livelycu_path, "app", "--volume", "50"], 
-                             capture_output=True, text=True, timeout=3)
+                self.livelycu("app", "--volume", "50", timeout=3)
             except:
                 pass
                 
@@ -195,7 +294,7 @@ class AdaptiveWallpaper:
     def set_wallpaper(self, video_name):
         """Set wallpaper using livelycu with smooth transitions"""
         try:
-            video_path = os.path.abspath(os.path.join(self.wallpaper_dir, f"{video_name}.mov"))
+            video_path = self.weather_graph.path(video_name)
             if not os.path.exists(video_path):
                 self.log(f"Video file not found: {video_path}")
                 return False
@@ -210,39 +309,36 @@ class AdaptiveWallpaper:
                 self.log("Same video - seeking to beginning for smooth transition")
                 # Reset video to beginning for smooth loop
                 try:
-                    subprocess.run([self.livelycu_path, "seekwp", "--value", "0"], 
-                                 capture_output=True, text=True, timeout=5)
+                    self.livelycu("seekwp", "--value", "0", timeout=5)
                 except:
                     pass
+                self.clip_started = self.clock.monotonic()
                 return True
             
             # Only close wallpapers when changing to different video
             if current_wallpaper_changed:
                 try:
-                    subprocess.run([self.livelycu_path, "closewp", "--monitor", "-1"], 
-                                 capture_output=True, text=True, timeout=5)
-                    time.sleep(0.2)  # Minimal pause for cleanup
+                    self.livelycu("closewp", "--monitor", "-1", timeout=5)
+                    self.clock.sleep(0.2)  # Minimal pause for cleanup
                 except:
                     pass
                 
                 # Set layout to duplicate mode (copy across all monitors)
                 try:
-                    subprocess.run([self.livelycu_path, "app", "--layout", "duplicate"], 
-                                 capture_output=True, text=True, timeout=5)
+                    self.livelycu("app", "--layout", "duplicate", timeout=5)
                 except Exception as e:
                     self.log(f"Warning: Could not set duplicate layout: {e}")
             
             # Set wallpaper on primary monitor - will duplicate to all monitors
             try:
-                result = subprocess.run([
-                    self.livelycu_path, "setwp", "--file", video_path
-                ], capture_output=True, text=True, check=True, timeout=10)
+                result = self.livelycu("setwp", "--file", video_path, check=True, timeout=10)
+                # The clip starts now, not after the popup-hiding call below
+                self.clip_started = self.clock.monotonic()
                 
                 # Hide app window immediately after setting wallpaper to minimize popups
                 if self.config.getboolean('DEBUG', 'hide_lively_popups'):
                     try:
-                        subprocess.run([self.livelycu_path, "app", "--showApp", "false"], 
-                                     capture_output=True, text=True, timeout=3)
+                        self.livelycu("app", "--showApp", "false", timeout=3)
                     except:
                         pass  # Don't fail if this doesn't work
                 
@@ -267,23 +363,40 @@ class AdaptiveWallpaper:
 
     def start_rain_sound(self):
         """Start rain sound with fade in"""
-        if not self.config.getboolean('AUDIO', 'enable_rain_sounds') or not self.rain_sound:
+        if not self.config.getboolean('AUDIO', 'enable_rain_sounds'):
+            return
+        
+        # Crossfade to the rain bed; non-blocking, pygame does the fade
+        if self._ambient_rain():
+            if not self.rain_playing:
+                self.ambient_bed.set_state(True, self._rain_fade_ms())
+                self.rain_playing = True
+                self.log("Rain sound started")
+            return
+        
+        # Still mixing in the background: remember the state for the switch
+        if self.ambient_bed:
+            self.ambient_bed.set_state(True)
+        
+        rain_sound = self.rain_sound
+        if not rain_sound:
             return
             
         if not self.rain_playing:
             try:
-                self.rain_sound.set_volume(0)
-                self.rain_sound.play(-1)
+                rain_sound.set_volume(0)
+                rain_sound.play(-1)
                 
                 # Fade in rain sound
                 fade_steps = self.config.getint('AUDIO', 'rain_fade_steps')
                 fade_delay = self.config.getfloat('AUDIO', 'rain_fade_delay')
+                rain_volume = self.config.getfloat('AUDIO', 'rain_volume')
                 
                 for i in range(fade_steps):
                     if not self.run:
                         break
-                    self.rain_sound.set_volume(i / (fade_steps * 2))
-                    time.sleep(fade_delay)
+                    rain_sound.set_volume(rain_volume * (i + 1) / fade_steps)
+                    self.clock.sleep(fade_delay)
                 
                 self.rain_playing = True
                 self.log("Rain sound started")
@@ -292,7 +405,21 @@ class AdaptiveWallpaper:
 
     def stop_rain_sound(self):
         """Stop rain sound with fade out"""
-        if not self.config.getboolean('AUDIO', 'enable_rain_sounds') or not self.rain_sound:
+        if not self.config.getboolean('AUDIO', 'enable_rain_sounds'):
+            return
+        
+        if self._ambient_rain():
+            if self.rain_playing:
+                self.ambient_bed.set_state(False, self._rain_fade_ms())
+                self.rain_playing = False
+                self.log("Rain sound stopped")
+            return
+        
+        if self.ambient_bed:
+            self.ambient_bed.set_state(False)
+        
+        rain_sound = self.rain_sound
+        if not rain_sound:
             return
             
         if self.rain_playing:
@@ -300,14 +427,15 @@ class AdaptiveWallpaper:
                 # Fade out rain sound
                 fade_steps = self.config.getint('AUDIO', 'rain_fade_steps')
                 fade_delay = self.config.getfloat('AUDIO', 'rain_fade_delay')
+                rain_volume = self.config.getfloat('AUDIO', 'rain_volume')
                 
                 for i in range(fade_steps):
                     if not self.run:
                         break
-                    self.rain_sound.set_volume((fade_steps - i) / (fade_steps * 2))
-                    time.sleep(fade_delay)
+                    rain_sound.set_volume(rain_volume * (fade_steps - i - 1) / fade_steps)
+                    self.clock.sleep(fade_delay)
                 
-                self.rain_sound.stop()
+                rain_sound.stop()
                 self.rain_playing = False
                 self.log("Rain sound stopped")
             except Exception as e:
@@ -327,39 +455,69 @@ class AdaptiveWallpaper:
                 pygame.mixer.music.play()
                 
                 while pygame.mixer.music.get_busy() and self.run:
-                    time.sleep(0.1)
+                    self.clock.sleep(0.1)
                 
                 self.current_music_index = (self.current_music_index + 1) % len(self.music_playlist)
                 
             except pygame.error as e:
                 self.log(f"Music playback error: {e}")
-                time.sleep(1)
+                self.clock.sleep(1)
             except Exception as e:
                 self.log(f"Unexpected music error: {e}")
-                time.sleep(1)
+                self.clock.sleep(1)
+
+    def wait_for_weather(self, raining, fallback):
+        """Wait until real weather matches, or sleep the simulated duration"""
+        deadline = self.clock.monotonic() + fallback
+        while self.run:
+            service = self.weather_service
+            remaining = max(0, deadline - self.clock.monotonic())
+            if not service:
+                self.clock.sleep(remaining)
+                return
+            # A reload swaps the service; wake up and keep waiting on the new one
+            result = service.wait_for(
+                raining, remaining,
+                should_run=lambda: self.run and self.weather_service is service
+            )
+            if result is not None:
+                return
+
+    def wait_for_clip(self, video_name, started):
+        """Sleep until the transition clip started at `started` has finished"""
+        remaining = self.weather_graph.duration(video_name) - (self.clock.monotonic() - started)
+        if remaining > 0:
+            self.clock.sleep(remaining)
 
     def weather_simulation(self):
         """Simulate weather changes with smooth wallpaper transitions"""
         while self.run:
             try:
+                # With real weather, stay clear until it actually rains
+                if self.weather_service:
+                    self.wait_for_weather(True, 0)
+                self.wait_while_paused()
+                
                 # Update time window
                 self.time_window = self.get_time_window()
                 
                 # Transition to rain
-                transition_to_rain = f"{self.time_window}_to_rain"
-                if self.smooth_wallpaper_transition(transition_to_rain):
+                transition_to_rain = self.weather_graph.to_rain(self.time_window)
+                transitioned = self.smooth_wallpaper_transition(transition_to_rain)
+                if transitioned:
                     self.current_weather = transition_to_rain
                     self.log(f"Weather: Transitioning to rain ({self.time_window})")
+                started = self.clip_started
                 
                 # Start rain sound
                 self.start_rain_sound()
                 
-                # Wait for transition
-                transition_duration = self.config.getint('TIMING', 'transition_duration')
-                time.sleep(transition_duration)
+                # Wait for the transition clip to end
+                if transitioned:
+                    self.wait_for_clip(transition_to_rain, started)
                 
                 # Full rain
-                rain_weather = f"{self.time_window}_rain"
+                rain_weather = self.weather_graph.advance(transition_to_rain)
                 if self.smooth_wallpaper_transition(rain_weather):
                     self.current_weather = rain_weather
                     self.log(f"Weather: Raining ({self.time_window})")
@@ -367,39 +525,50 @@ class AdaptiveWallpaper:
                 # Rain duration
                 min_rain = self.config.getint('TIMING', 'min_rain_duration')
                 max_rain = self.config.getint('TIMING', 'max_rain_duration')
-                rain_duration = random.randint(min_rain, max_rain)
-                self.log(f"Rain will last for {rain_duration} seconds")
-                time.sleep(rain_duration)
+                rain_duration = self.rng.randint(min_rain, max_rain)
+                if self.weather_service and self.weather_service.is_raining() is not None:
+                    self.log("Rain will last until real conditions clear")
+                else:
+                    self.log(f"Rain will last for {rain_duration} seconds")
+                self.wait_for_weather(False, rain_duration)
+                self.wait_while_paused()
                 
                 # Transition back to clear
-                transition_to_clear = f"rain_to_{self.time_window}"
-                if self.smooth_wallpaper_transition(transition_to_clear):
+                transition_to_clear = self.weather_graph.to_clear(self.time_window)
+                transitioned = self.smooth_wallpaper_transition(transition_to_clear)
+                if transitioned:
                     self.current_weather = transition_to_clear
                     self.log(f"Weather: Transitioning to clear ({self.time_window})")
+                started = self.clip_started
                 
                 # Stop rain sound
                 self.stop_rain_sound()
                 
-                # Wait for transition
-                time.sleep(transition_duration)
+                # Wait for the transition clip to end
+                if transitioned:
+                    self.wait_for_clip(transition_to_clear, started)
                 
                 # Clear weather
-                if self.smooth_wallpaper_transition(self.time_window):
-                    self.current_weather = self.time_window
+                clear_weather = self.weather_graph.advance(transition_to_clear)
+                if self.smooth_wallpaper_transition(clear_weather):
+                    self.current_weather = clear_weather
                     self.log(f"Weather: Clear ({self.time_window})")
                 
                 # Clear weather duration
                 min_clear = self.config.getint('TIMING', 'min_clear_duration')
                 max_clear = self.config.getint('TIMING', 'max_clear_duration')
-                clear_duration = random.randint(min_clear, max_clear)
-                self.log(f"Clear weather will last for {clear_duration} seconds")
-                time.sleep(clear_duration)
+                clear_duration = self.rng.randint(min_clear, max_clear)
+                if self.weather_service and self.weather_service.is_raining() is not None:
+                    self.log("Clear weather will last until real rain starts")
+                else:
+                    self.log(f"Clear weather will last for {clear_duration} seconds")
+                self.wait_for_weather(True, clear_duration)
                 
             except KeyboardInterrupt:
                 break
             except Exception as e:
                 self.log(f"Weather simulation error: {e}")
-                time.sleep(10)
+                self.clock.sleep(10)
 
     def time_window_updater(self):
         """Update time window and wallpaper when time changes"""
@@ -407,32 +576,125 @@ class AdaptiveWallpaper:
         
         while self.run:
             try:
+                self.wait_while_paused()
                 current_time_window = self.get_time_window()
                 
                 # If time window changed and we're not in a weather transition
                 if (current_time_window != last_time_window and 
-                    not any(transition in self.current_weather for transition in ["_to_", "_rain"])):
+                    self.weather_graph.is_clear(self.current_weather)):
                     
                     self.time_window = current_time_window
-                    if self.smooth_wallpaper_transition(self.time_window):
-                        self.current_weather = self.time_window
+                    clear_weather = self.weather_graph.clear_state(self.time_window)
+                    if self.smooth_wallpaper_transition(clear_weather):
+                        self.current_weather = clear_weather
                         self.log(f"Time window changed to: {self.time_window}")
                     last_time_window = current_time_window
                 
-                time.sleep(60)  # Check every minute
+                self.clock.sleep(60)  # Check every minute
                 
             except KeyboardInterrupt:
                 break
             except Exception as e:
                 self.log(f"Time updater error: {e}")
-                time.sleep(60)
+                self.clock.sleep(60)
+
+    def wait_while_paused(self):
+        """Hold weather and time window changes while paused"""
+        while self.paused and self.run:
+            self.clock.sleep(0.5)
+
+    def status(self):
+        """Current state for the control socket"""
+        return {
+            "weather": self.current_weather,
+            "time_window": self.time_window,
+            "rain": self.rain_playing,
+            "paused": self.paused,
+            "real_weather": self.weather_service.condition() if self.weather_service else None,
+            "real_weather_state": self.weather_service.state(self.time_window) if self.weather_service else None
+        }
+
+    def refresh_weather(self):
+        """Fetch real weather now; repeated requests share one fetch"""
+        if not self.weather_service:
+            raise RuntimeError("No weather provider configured")
+        self.weather_service.request_refresh()
+        return self.status()
+
+    def metrics_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        snapshot.update(self.status())
+        return snapshot
+
+    def force_weather(self, state):
+        """Switch straight to a weather state; pause to keep it there"""
+        if state not in self.weather_graph.states:
+            raise ValueError(f"Unknown weather state: {state}")
+        if self.weather_graph.is_transition(state):
+            raise ValueError(f"Cannot force a transition clip: {state}")
+        if not self.smooth_wallpaper_transition(state):
+            raise RuntimeError(f"Could not set wallpaper: {state}")
+        self.current_weather = state
+        self.log(f"Weather forced: {state}")
+        
+        # Fade rain audio in the background so the reply isn't delayed
+        rain_audio = self.start_rain_sound if self.weather_graph.is_raining(state) else self.stop_rain_sound
+        threading.Thread(target=rain_audio, daemon=True).start()
+        return self.status()
+
+    def pause(self):
+        """Freeze the weather schedule and audio"""
+        self.paused = True
+        if pygame.mixer.get_init():
+            pygame.mixer.pause()
+            pygame.mixer.music.pause()
+        self.log("Paused")
+        return self.status()
+
+    def resume(self):
+        self.paused = False
+        if pygame.mixer.get_init():
+            pygame.mixer.unpause()
+            pygame.mixer.music.unpause()
+        self.log("Resumed")
+        return self.status()
+
+    def reload_config(self):
+        """Re-read the config file without restarting"""
+        config = AdaptiveWallpaperConfig(self.config_file)
+        wallpaper_dir = config.get('PATHS', 'wallpaper_dir')
+        weather_graph = WeatherGraph(
+            wallpaper_dir,
+            default_duration=config.getfloat('TIMING', 'transition_duration')
+        )
+        # Keep the running configuration if the new one points at missing videos
+        missing = weather_graph.validate()
+        if missing:
+            raise RuntimeError(f"Missing wallpaper videos: {', '.join(missing)}")
+        weather_graph.probe_all()
+        
+        self.config = config
+        self.livelycu_path = config.get('PATHS', 'livelycu_path')
+        self.wallpaper_dir = wallpaper_dir
+        self.sound_dir = config.get('PATHS', 'sound_dir')
+        self.weather_graph = weather_graph
+        
+        # Start the new service before stopping the old one so waiters move across
+        old_service = self.weather_service
+        self.weather_service = create_weather_service(self.config, clock=self.clock, log=self.log)
+        if self.weather_service:
+            self.weather_service.start()
+        if old_service:
+            old_service.stop()
+        
+        self.log(f"Configuration reloaded from {self.config_file}")
+        return self.status()
 
     def close_wallpaper(self):
         """Close current wallpaper properly"""
         try:
-            subprocess.run([self.livelycu_path, "closewp", "--monitor", "-1"], 
-                         capture_output=True, text=True, check=True, timeout=10)
-            time.sleep(0.5)  # Allow cleanup time
+            self.livelycu("closewp", "--monitor", "-1", check=True, timeout=10)
+            self.clock.sleep(0.5)  # Allow cleanup time
             self.log("Closed all wallpapers")
         except subprocess.CalledProcessError as e:
             self.log(f"Error closing wallpaper: {e}")
@@ -453,10 +715,19 @@ class AdaptiveWallpaper:
             print("Please update the path in config.ini")
             return
         
+        # Check that every wallpaper referenced by the weather graph exists
+        missing = self.weather_graph.validate()
+        if missing:
+            print("Error: missing wallpaper videos:")
+            for path in missing:
+                print(f"  {path}")
+            print("Please check wallpaper_dir in config.ini")
+            return
+        self.weather_graph.probe_all()
+        
         # Set layout to duplicate mode for multi-monitor support and hide app
         try:
-            subprocess.run([self.livelycu_path, "app", "--layout", "duplicate"], 
-                         capture_output=True, text=True, timeout=10)
+            self.livelycu("app", "--layout", "duplicate", timeout=10)
             self.log("Configured Lively for duplicate layout (multi-monitor)")
         except Exception as e:
             self.log(f"Warning: Could not configure duplicate layout: {e}")
@@ -464,18 +735,17 @@ class AdaptiveWallpaper:
         # Hide the Lively app window to minimize popups
         if self.config.getboolean('DEBUG', 'hide_lively_popups'):
             try:
-                subprocess.run([self.livelycu_path, "app", "--showApp", "false"], 
-                             capture_output=True, text=True, timeout=5)
+                self.livelycu("app", "--showApp", "false", timeout=5)
                 self.log("Configured Lively to hide app window")
             except Exception as e:
                 self.log(f"Warning: Could not hide app window: {e}")
         
         # Initialize
         self.time_window = self.get_time_window()
-        self.current_weather = self.time_window
+        self.current_weather = self.weather_graph.clear_state(self.time_window)
         
         # Set initial wallpaper
-        if self.set_wallpaper(self.time_window):
+        if self.set_wallpaper(self.current_weather):
             self.log(f"Initial wallpaper set: {self.time_window}")
         else:
             print("Failed to set initial wallpaper")
@@ -484,6 +754,17 @@ class AdaptiveWallpaper:
         # Start background threads
         threads = []
         
+        if self.control_server:
+            try:
+                self.control_server.start()
+            except OSError as e:
+                self.log(f"Warning: Could not start control server: {e}")
+                self.control_server = None
+        
+        if self.weather_service:
+            self.weather_service.start()
+            self.log("Real weather provider started")
+        
         if self.config.getboolean('AUDIO', 'enable_music') and self.music_playlist:
             music_thread = threading.Thread(target=self.music_player, daemon=True)
             music_thread.start()
@@ -502,17 +783,22 @@ class AdaptiveWallpaper:
             if self.config.getboolean('DEBUG', 'show_status_updates'):
                 update_interval = self.config.getint('DEBUG', 'status_update_interval')
                 while self.run:
-                    current_time = datetime.now().strftime("%H:%M:%S")
+                    current_time = self.clock.now().strftime("%H:%M:%S")
                     status = f"[{current_time}] {self.current_weather} | Rain: {'Yes' if self.rain_playing else 'No'}"
                     print(f"\r{status:<80}", end="", flush=True)
-                    time.sleep(update_interval)
+                    self.clock.sleep(update_interval)
             else:
                 while self.run:
-                    time.sleep(1)
+                    self.clock.sleep(1)
         except KeyboardInterrupt:
             print("\n\nShutting down...")
             self.run = False
             
+            if self.weather_service:
+                self.weather_service.stop()
+            if self.control_server:
+                self.control_server.stop()
+            
             # Stop audio
             if pygame.mixer.get_init():
                 pygame.mixer.stop()
@@ -0,0 +1,272 @@
+import argparse
+import configparser
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Keep pygame from opening a real audio device during the soak
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from lively_wallpaper_advanced import AdaptiveWallpaper
+import virtual_clock
+from virtual_clock import VirtualClock
+from weather_graph import WeatherGraph
+from weather_provider import WeatherCache, WeatherProvider, WeatherService
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakeLively:
+    """Stands in for livelycu.exe, recording every launch in virtual time"""
+
+    def __init__(self, clock, rng, latency=(0.05, 0.3)):
+        self.clock = clock
+        self.rng = rng
+        self.latency = latency
+        self.calls = []
+
+    def __call__(self, command, capture_output=False, text=False, check=False, timeout=None):
+        self.clock.sleep(self.rng.uniform(*self.latency))
+        self.calls.append((self.clock.now(), command[1:]))
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+
+class FakeSound:
+    """Minimal pygame.mixer.Sound replacement so rain fades run"""
+
+    def __init__(self):
+        self.volume = 0.0
+        self.plays = 0
+        self.volume_changes = 0
+
+    def set_volume(self, volume):
+        self.volume = volume
+        self.volume_changes += 1
+
+    def play(self, loops=0):
+        self.plays += 1
+
+    def stop(self):
+        self.volume = 0.0
+
+
+class FakeWeatherProvider(WeatherProvider):
+    """Real-weather stand-in: rain and clear spells of random virtual length"""
+
+    def __init__(self, clock, rng, spell=(1800, 4 * 3600), failure_rate=0.05):
+        self.clock = clock
+        self.rng = rng
+        self.spell = spell
+        self.failure_rate = failure_rate
+        self.raining = False
+        self.next_change = rng.uniform(*spell)
+        self.fetches = 0
+        self.failures = 0
+
+    def key(self):
+        return "soak"
+
+    def fetch(self):
+        self.fetches += 1
+        while self.clock.monotonic() >= self.next_change:
+            self.raining = not self.raining
+            self.next_change += self.rng.uniform(*self.spell)
+        self.clock.sleep(self.rng.uniform(0.1, 1.0))
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            raise OSError("simulated provider outage")
+        return "rain" if self.raining else "clear"
+
+
+def write_soak_config(directory):
+    """Copy config.ini with paths pointed at a scratch directory"""
+    config = configparser.ConfigParser()
+    config.read(os.path.join(BASE_DIR, "config.ini"))
+    config['PATHS']['livelycu_path'] = os.path.join(directory, "livelycu.exe")
+    config['PATHS']['wallpaper_dir'] = os.path.join(directory, "wallpapers")
+    config['PATHS']['sound_dir'] = os.path.join(directory, "sounds")
+    config['AUDIO']['enable_background_sounds'] = 'false'
+    config['AUDIO']['enable_music'] = 'false'
+    config['AUDIO']['enable_rain_sounds'] = 'true'
+    config['WEATHER']['provider'] = 'none'
+    config['CONTROL']['enable_control'] = 'false'
+    config['DEBUG']['verbose_logging'] = 'false'
+
+    # Every clip the weather graph references must exist
+    graph = WeatherGraph(config['PATHS']['wallpaper_dir'], duration_cache=None)
+    os.makedirs(config['PATHS']['wallpaper_dir'], exist_ok=True)
+    for path in graph.validate():
+        open(path, "wb").close()
+
+    path = os.path.join(directory, "config.ini")
+    with open(path, "w") as f:
+        config.write(f)
+    return path
+
+
+def time_window_boundaries(wallpaper, start, end):
+    """(time, time_window) for every window change between start and end"""
+    starts = [
+        (wallpaper.config.getint('TIMING', 'morning_start'), "morning"),
+        (wallpaper.config.getint('TIMING', 'day_start'), "day"),
+        (wallpaper.config.getint('TIMING', 'evening_start'), "evening"),
+        (wallpaper.config.getint('TIMING', 'night_start'), "night")
+    ]
+    boundaries = []
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < end:
+        for hour, time_window in starts:
+            moment = day + timedelta(hours=hour)
+            if start < moment < end:
+                boundaries.append((moment, time_window))
+        day += timedelta(days=1)
+    return boundaries
+
+
+def controller_memory():
+    """Traced bytes allocated outside the harness and virtual clock"""
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, virtual_clock.__file__)
+    ])
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def run_soak(days=3, seed=0, start=None, real_weather=False):
+    """Run the controller for `days` of virtual time and return a report
+
+    With `real_weather` the weather follows a simulated provider through
+    WeatherService instead of the random timer.
+    """
+    start = start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    hours = int(days * 24)
+    clock = VirtualClock(start)
+    rng = random.Random(seed)
+    lively = FakeLively(clock, random.Random(seed + 1))
+
+    with tempfile.TemporaryDirectory() as directory:
+        wallpaper = AdaptiveWallpaper(write_soak_config(directory), clock=clock, rng=rng, runner=lively)
+        wallpaper.rain_sound = FakeSound()
+        graph = wallpaper.weather_graph
+        provider = None
+        if real_weather:
+            provider = FakeWeatherProvider(clock, random.Random(seed + 2))
+            wallpaper.weather_service = WeatherService(
+                provider, WeatherCache(clock=clock), clock=clock, log=wallpaper.log
+            )
+
+        tracemalloc.start()
+        threads = []
+        clock.register()
+        try:
+            wallpaper.time_window = wallpaper.get_time_window()
+            wallpaper.current_weather = graph.clear_state(wallpaper.time_window)
+            wallpaper.set_wallpaper(wallpaper.current_weather)
+            if wallpaper.weather_service:
+                wallpaper.weather_service.start()
+
+            threads = [
+                clock.spawn(wallpaper.weather_simulation),
+                clock.spawn(wallpaper.time_window_updater)
+            ]
+
+            memory = [controller_memory()]
+            for _ in range(hours):
+                clock.sleep(3600)
+                memory.append(controller_memory())
+        finally:
+            wallpaper.run = False
+            if wallpaper.weather_service:
+                wallpaper.weather_service.stop()
+            clock.unregister()
+            clock.stop()
+            tracemalloc.stop()
+        for thread in threads:
+            thread.join(timeout=5)
+        if wallpaper.weather_service:
+            wallpaper.weather_service.thread.join(timeout=5)
+
+    # Launches per virtual hour
+    per_hour = Counter(int((moment - start).total_seconds() // 3600) for moment, _ in lively.calls)
+    launches = [per_hour.get(hour, 0) for hour in range(hours)]
+
+    # Wallpapers actually shown, from setwp calls
+    shown = []
+    for moment, args in lively.calls:
+        if args[:2] == ["setwp", "--file"]:
+            name = os.path.splitext(os.path.basename(args[2]))[0]
+            shown.append((moment, name))
+    transitions = Counter(name for _, name in shown if graph.is_transition(name))
+
+    # A boundary is missed when its time window never appears before the next one
+    end = start + timedelta(hours=hours)
+    boundaries = time_window_boundaries(wallpaper, start, end)
+    missed = []
+    lags = []
+    for i, (moment, time_window) in enumerate(boundaries):
+        next_moment = boundaries[i + 1][0] if i + 1 < len(boundaries) else end
+        matches = [m for m, name in shown
+                   if moment <= m < next_moment and graph.states[name]["time_window"] == time_window]
+        if matches:
+            lags.append((matches[0] - moment).total_seconds())
+        else:
+            missed.append((moment, time_window))
+
+    return {
+        "days": days,
+        "launches_total": len(lively.calls),
+        "launches_per_hour_avg": sum(launches) / len(launches) if launches else 0,
+        "launches_per_hour_max": max(launches) if launches else 0,
+        "transitions": dict(transitions),
+        "boundaries": len(boundaries),
+        "missed_boundaries": missed,
+        "max_boundary_lag_s": max(lags) if lags else 0,
+        "memory_start_bytes": memory[0],
+        "memory_end_bytes": memory[-1],
+        "memory_peak_bytes": max(memory),
+        "memory_growth_per_day_bytes": (memory[-1] - memory[0]) / days if days else 0,
+        "rain_volume_changes": wallpaper.rain_sound.volume_changes,
+        "weather_fetches": provider.fetches if provider else 0,
+        "weather_fetch_failures": provider.failures if provider else 0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accelerated soak test of the Lively controller")
+    parser.add_argument("--days", type=float, default=3, help="virtual days to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the weather schedule")
+    parser.add_argument("--real-weather", action="store_true",
+                        help="drive the weather from a simulated provider instead of the random timer")
+    args = parser.parse_args()
+
+    report = run_soak(args.days, args.seed, real_weather=args.real_weather)
+
+    print("=" * 50)
+    print(f"Soak test: {report['days']} virtual days")
+    print("=" * 50)
+    print(f"livelycu launches: {report['launches_total']} "
+          f"(avg {report['launches_per_hour_avg']:.1f}/h, max {report['launches_per_hour_max']}/h)")
+    for name, count in sorted(report['transitions'].items()):
+        print(f"  {name}: {count}")
+    if args.real_weather:
+        print(f"Weather fetches: {report['weather_fetches']} "
+              f"({report['weather_fetch_failures']} failed)")
+    print(f"Time window boundaries: {report['boundaries']}, "
+          f"missed: {len(report['missed_boundaries'])}, "
+          f"max lag: {report['max_boundary_lag_s']:.0f}s")
+    for moment, time_window in report['missed_boundaries']:
+        print(f"  missed {time_window} at {moment}")
+    print(f"Memory: {report['memory_start_bytes'] / 1024:.0f} KiB -> "
+          f"{report['memory_end_bytes'] / 1024:.0f} KiB "
+          f"({report['memory_growth_per_day_bytes'] / 1024:+.1f} KiB/day)")
+
+    sys.exit(1 if report['missed_boundaries'] else 0)
+
+
+if __name__ == "__main__":
+    main()
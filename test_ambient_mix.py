@@ -0,0 +1,90 @@
+import importlib
+import sys
+import time
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+
+class FakeChannel:
+    def __init__(self):
+        self.volume = 1.0
+        self.plays = []
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def get_volume(self):
+        return self.volume
+
+    def play(self, sound, loops=0):
+        self.plays.append((sound, loops))
+
+    def stop(self):
+        self.plays.append(None)
+
+
+@pytest.fixture
+def ambient_mix(monkeypatch):
+    """Import ambient_mix with a stand-in pygame so only NumPy is needed"""
+    pygame = types.ModuleType("pygame")
+    pygame.error = RuntimeError
+    pygame.mixer = types.SimpleNamespace(find_channel=lambda force=False: FakeChannel())
+    monkeypatch.setitem(sys.modules, "pygame", pygame)
+    monkeypatch.delitem(sys.modules, "ambient_mix", raising=False)
+    yield importlib.import_module("ambient_mix")
+    sys.modules.pop("ambient_mix", None)
+
+
+def seam_levels(loop, window=400, span=3000):
+    """Windowed RMS in dB relative to the whole loop, across the wrap-around seam"""
+    wrapped = np.concatenate([loop, loop])
+    reference = np.sqrt(np.mean(loop ** 2))
+    return np.array([
+        20 * np.log10(np.sqrt(np.mean(wrapped[i:i + window] ** 2)) / reference)
+        for i in range(len(loop) - span, len(loop) + span - window, window // 2)
+    ])
+
+
+def noise(length, seed):
+    return np.random.default_rng(seed).standard_normal((length, 2)).astype(np.float32) * 0.2
+
+
+def test_make_loop_keeps_noise_level_across_seam(ambient_mix):
+    loop = ambient_mix.make_loop(noise(20000, 0), 1000)
+    assert len(loop) == 19000
+    assert np.abs(seam_levels(loop)).max() < 1.0
+
+
+def test_mix_layers_keeps_noise_level_across_seam(ambient_mix):
+    bed = ambient_mix.mix_layers([(noise(20000, 1), 0.5), (noise(7000, 2), 0.5)], 1000)
+    # As long as the longest layer, with no extra fold that would swell the seam
+    assert len(bed) == 19000
+    assert np.abs(seam_levels(bed)).max() < 1.0
+
+
+def test_fit_loop_hits_exact_length(ambient_mix):
+    loop = ambient_mix.make_loop(noise(7000, 3), 1000)
+    assert len(ambient_mix.fit_loop(loop, 18000, 1000)) == 18000
+    assert len(ambient_mix.fit_loop(loop, 12000, 1000)) == 12000
+
+
+def test_set_state_crossfades_without_restarting(ambient_mix, tmp_path):
+    bed = ambient_mix.AmbientBed(str(tmp_path))
+    bed.beds = {"clear": [], "rain": []}
+    bed.sounds = {"clear": "clear bed", "rain": "rain bed"}
+
+    bed.play(fade_ms=50)
+    clear, rain = bed.channels["clear"], bed.channels["rain"]
+    time.sleep(0.3)
+    assert (clear.volume, rain.volume) == (1.0, 0.0)
+
+    bed.set_state(True, fade_ms=50)
+    time.sleep(0.3)
+    assert (clear.volume, rain.volume) == (0.0, 1.0)
+    # Both beds were started once and kept running in step
+    assert clear.plays == [("clear bed", -1)]
+    assert rain.plays == [("rain bed", -1)]
+    bed.stop()
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from virtual_clock import VirtualClock
+
+
+def test_sleep_advances_virtual_time():
+    start = datetime(2024, 1, 1, 4, 59)
+    clock = VirtualClock(start)
+    clock.register()
+    clock.sleep(3600)
+    assert clock.monotonic() == 3600
+    assert clock.now() == start + timedelta(hours=1)
+    clock.unregister()
+
+
+def test_threads_wake_in_virtual_time_order():
+    clock = VirtualClock(datetime(2024, 1, 1))
+    order = []
+
+    def sleeper(name, seconds):
+        clock.sleep(seconds)
+        order.append((name, clock.monotonic()))
+
+    clock.register()
+    threads = [clock.spawn(sleeper, "slow", 300), clock.spawn(sleeper, "fast", 30)]
+    clock.sleep(600)
+    clock.unregister()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == [("fast", 30), ("slow", 300)]
+    assert clock.monotonic() == 600
+
+
+def test_stop_releases_sleepers():
+    clock = VirtualClock()
+    clock.register()
+    clock.register()  # a participant that never sleeps keeps time frozen
+    thread = clock.spawn(clock.sleep, 60)
+    clock.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_wait_returns_early_when_event_is_set():
+    clock = VirtualClock()
+    event = threading.Event()
+
+    def setter():
+        clock.sleep(30)
+        event.set()
+
+    clock.register()
+    thread = clock.spawn(setter)
+    assert clock.wait(event, 600) is True
+    assert 30 <= clock.monotonic() <= 31
+    assert clock.wait(threading.Event(), 60) is False
+    clock.unregister()
+    thread.join(timeout=5)
+
+
+def test_soak_day_hits_every_time_window():
+    pytest.importorskip("pygame")
+    from soak import run_soak
+
+    report = run_soak(days=1, seed=1, start=datetime(2024, 1, 1))
+    assert report["missed_boundaries"] == []
+    assert report["boundaries"] == 4
+    assert report["transitions"]
+
+
+def test_soak_day_follows_real_weather():
+    pytest.importorskip("pygame")
+    from soak import run_soak
+
+    report = run_soak(days=1, seed=1, start=datetime(2024, 1, 1), real_weather=True)
+    assert report["missed_boundaries"] == []
+    assert report["weather_fetches"]
+    assert report["transitions"]
@@ -0,0 +1,81 @@
+import socket
+
+import pytest
+
+from control_server import ControlServer, Metrics, percentile, send_command
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile([], 0.5) is None
+    assert percentile([7], 0.99) == 7
+    assert percentile(values, 0.0) == 1
+    assert percentile(values, 0.5) == 51
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 1.0) == 100
+
+
+def test_metrics_snapshot():
+    metrics = Metrics(window=3)
+    snapshot = metrics.snapshot()
+    assert snapshot["fps"] is None
+    assert snapshot["frame_time"]["count"] == 0
+    assert snapshot["frame_time"]["p50_ms"] is None
+    assert snapshot["livelycu"] == {}
+
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        metrics.record_call("setwp", latency)
+    metrics.record_frame(0.016)
+
+    snapshot = metrics.snapshot()
+    setwp = snapshot["livelycu"]["setwp"]
+    # The window keeps the last three samples but the total counts every call
+    assert setwp["count"] == 3
+    assert setwp["total"] == 4
+    assert setwp["p50_ms"] == pytest.approx(300)
+    assert setwp["max_ms"] == pytest.approx(400)
+    assert snapshot["frame_time"]["count"] == 1
+
+
+def test_handle_dispatches_commands():
+    server = ControlServer({"echo": lambda *args: list(args), "fail": lambda: 1 / 0})
+    assert server.handle({"command": "echo", "args": ["day_rain"]}) == {"ok": True, "result": ["day_rain"]}
+    assert server.handle({"command": "echo"}) == {"ok": True, "result": []}
+
+    reply = server.handle({"command": "fail"})
+    assert reply["ok"] is False and "division" in reply["error"]
+
+    reply = server.handle({"command": "missing"})
+    assert reply["ok"] is False
+    assert reply["commands"] == ["echo", "fail"]
+
+    assert server.handle(["not", "a", "dict"])["ok"] is False
+
+
+def test_tcp_round_trip():
+    server = ControlServer({"status": lambda: {"weather": "day"}}, port=0)
+    server.start()
+    try:
+        port = int(server.address().rsplit(":", 1)[1])
+        assert send_command("status", port=port) == {"ok": True, "result": {"weather": "day"}}
+    finally:
+        server.stop()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets only")
+def test_unix_socket_refuses_live_server_and_non_socket(tmp_path):
+    path = str(tmp_path / "control.sock")
+    server = ControlServer({"status": lambda: "ok"}, socket_path=path)
+    server.start()
+    try:
+        with pytest.raises(OSError):
+            ControlServer({}, socket_path=path).start()
+        assert send_command("status", socket_path=path)["result"] == "ok"
+    finally:
+        server.stop()
+
+    regular = tmp_path / "not_a_socket"
+    regular.write_text("keep me")
+    with pytest.raises(OSError):
+        ControlServer({}, socket_path=str(regular)).start()
+    assert regular.read_text() == "keep me"
@@ -0,0 +1,62 @@
+import json
+import os
+
+from weather_graph import TIME_WINDOWS, WeatherGraph
+
+
+def make_graph(tmp_path, **kwargs):
+    kwargs.setdefault("duration_cache", str(tmp_path / "durations.json"))
+    return WeatherGraph(str(tmp_path / "wallpapers"), **kwargs)
+
+
+def test_transitions_advance_to_their_target(tmp_path):
+    graph = make_graph(tmp_path)
+    assert graph.advance("day_to_rain") == "day_rain"
+    assert graph.advance("rain_to_night") == "night"
+    # Looping states stay where they are
+    assert graph.advance("evening_rain") == "evening_rain"
+    assert graph.advance("morning") == "morning"
+
+
+def test_state_kinds(tmp_path):
+    graph = make_graph(tmp_path)
+    assert len(graph.states) == 4 * len(TIME_WINDOWS)
+    assert graph.is_clear("day")
+    assert not graph.is_clear("day_rain")
+    assert not graph.is_clear("rain_to_day")
+    assert not graph.is_clear("unknown")
+    assert graph.is_transition("night_to_rain")
+    assert graph.is_raining("night_to_rain")
+    assert not graph.is_raining("rain_to_night")
+
+
+def test_validate_lists_missing_assets(tmp_path):
+    graph = make_graph(tmp_path)
+    assert len(graph.validate()) == len(graph.states)
+
+    os.makedirs(tmp_path / "wallpapers")
+    for name in graph.states:
+        if name != "day_to_rain":
+            open(graph.path(name), "wb").close()
+    assert graph.validate() == [graph.path("day_to_rain")]
+
+
+def test_duration_cache_key_tracks_file_changes(tmp_path):
+    graph = make_graph(tmp_path, default_duration=8.0)
+    os.makedirs(tmp_path / "wallpapers")
+    path = graph.path("day_to_rain")
+    with open(path, "wb") as f:
+        f.write(b"clip")
+
+    # Missing clips fall back to the configured duration
+    assert graph.duration("rain_to_day") == 8.0
+
+    key = graph._duration_key(path)
+    with open(tmp_path / "durations.json", "w") as f:
+        json.dump({key: 5.5}, f)
+    assert make_graph(tmp_path).duration("day_to_rain") == 5.5
+
+    # A re-exported clip gets a new key and is probed again
+    with open(path, "wb") as f:
+        f.write(b"longer clip")
+    assert graph._duration_key(path) != key
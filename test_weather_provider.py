@@ -0,0 +1,133 @@
+import threading
+import time
+
+from weather_provider import WeatherCache, WeatherProvider, WeatherService
+
+
+class StubProvider(WeatherProvider):
+    """Returns a fixed condition after `delay` seconds, or raises if `fail`"""
+
+    def __init__(self, condition="clear", delay=0.0, fail=False):
+        self.condition = condition
+        self.delay = delay
+        self.fail = fail
+        self.fetches = 0
+
+    def key(self):
+        return "stub"
+
+    def fetch(self):
+        self.fetches += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise OSError("provider down")
+        return self.condition
+
+
+def test_cache_ttl_and_max_age():
+    cache = WeatherCache(ttl=60, max_age=120)
+    assert cache.get("stub") == (None, False)
+    cache.put("stub", "rain")
+    assert cache.get("stub") == ("rain", True)
+
+    cache.entries["stub"] = ("rain", time.time() - 90)
+    assert cache.get("stub") == ("rain", False)
+    cache.entries["stub"] = ("rain", time.time() - 150)
+    assert cache.get("stub") == (None, False)
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.json")
+    WeatherCache(path).put("stub", "drizzle")
+    assert WeatherCache(path).get("stub") == ("drizzle", True)
+
+
+def test_backoff_doubles_up_to_limit():
+    service = WeatherService(StubProvider(), WeatherCache(), retry_delay=15, max_backoff=100)
+    delays = []
+    for failures in range(1, 6):
+        service.failures = failures
+        delays.append(service._next_delay())
+    assert delays == [15, 30, 60, 100, 100]
+
+
+def test_cold_start_waits_for_first_fetch():
+    provider = StubProvider("clear", delay=0.3)
+    service = WeatherService(provider, WeatherCache(), first_fetch_timeout=2)
+    service.start()
+    started = time.monotonic()
+    try:
+        # A zero fallback must not be taken before the first fetch lands
+        assert service.wait_for(False, 0) is True
+        assert time.monotonic() - started >= 0.3
+    finally:
+        service.stop()
+
+
+def test_clear_weather_keeps_rain_waiters_blocked():
+    service = WeatherService(StubProvider("clear", delay=0.3), WeatherCache(), first_fetch_timeout=2)
+    service.start()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(service.wait_for(True, 0)), daemon=True)
+    waiter.start()
+    waiter.join(timeout=1.0)
+    try:
+        assert waiter.is_alive()
+        assert results == []
+    finally:
+        service.stop()
+    waiter.join(timeout=2)
+    # Stopping wakes the waiter without pretending the fallback expired
+    assert results == [None]
+
+
+def test_cold_start_falls_back_when_provider_fails():
+    service = WeatherService(StubProvider(fail=True), WeatherCache(),
+                             retry_delay=60, first_fetch_timeout=2)
+    service.start()
+    started = time.monotonic()
+    try:
+        assert service.wait_for(True, 0.2) is False
+        assert time.monotonic() - started < 1.5
+        assert service.failures == 1
+    finally:
+        service.stop()
+
+
+def test_fresh_cache_skips_fetch():
+    provider = StubProvider("rain")
+    cache = WeatherCache(ttl=600)
+    cache.put("stub", "rain")
+    service = WeatherService(provider, cache)
+    service.start()
+    try:
+        assert service.wait_for(True, 0) is True
+        assert provider.fetches == 0
+    finally:
+        service.stop()
+
+
+def test_state_maps_conditions_onto_wallpapers():
+    cache = WeatherCache()
+    service = WeatherService(StubProvider(), cache)
+    assert service.state("day") is None
+    cache.put("stub", "thunderstorm")
+    assert service.state("evening") == "evening_rain"
+    cache.put("stub", "clouds")
+    assert service.state("night") == "night"
+
+
+def test_refresh_requests_coalesce_into_one_fetch():
+    provider = StubProvider("clear", delay=0.2)
+    cache = WeatherCache(ttl=600)
+    cache.put("stub", "clear")
+    service = WeatherService(provider, cache, refresh_interval=600)
+    service.start()
+    try:
+        time.sleep(0.1)
+        for _ in range(5):
+            service.request_refresh()
+        time.sleep(0.6)
+        assert provider.fetches == 1
+    finally:
+        service.stop()
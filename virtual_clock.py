@@ -0,0 +1,113 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """Wall clock used when nothing else is injected"""
+
+    def now(self):
+        return datetime.now()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """Event.wait that VirtualClock can replay in simulated time"""
+        return event.wait(timeout)
+
+    def spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+
+class VirtualClock:
+    """Simulated clock shared by a fixed set of threads
+
+    Time only moves when every registered thread is inside sleep(); it then
+    jumps straight to the earliest wake-up, so hours of scheduling run in
+    milliseconds while keeping the threads' relative ordering.
+    """
+
+    def __init__(self, start=None):
+        self.start = start or datetime.now()
+        self.elapsed = 0.0
+        self.participants = 0
+        self.sleeping = 0
+        self.wakeups = []
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def now(self):
+        with self.condition:
+            return self.start + timedelta(seconds=self.elapsed)
+
+    def monotonic(self):
+        with self.condition:
+            return self.elapsed
+
+    def register(self):
+        """Count the calling thread as a participant"""
+        with self.condition:
+            self.participants += 1
+
+    def unregister(self):
+        with self.condition:
+            self.participants -= 1
+            self._advance()
+
+    def spawn(self, target, *args):
+        """Start a daemon thread that takes part in virtual time"""
+        # Register before starting so time can't move until the thread runs
+        self.register()
+
+        def participant():
+            try:
+                target(*args)
+            finally:
+                self.unregister()
+
+        thread = threading.Thread(target=participant, daemon=True)
+        thread.start()
+        return thread
+
+    def sleep(self, seconds):
+        with self.condition:
+            if self.stopped:
+                return
+            wake = self.elapsed + max(0.0, seconds)
+            heapq.heappush(self.wakeups, wake)
+            self.sleeping += 1
+            self._advance()
+            while self.elapsed < wake and not self.stopped:
+                self.condition.wait()
+            self.wakeups.remove(wake)
+            heapq.heapify(self.wakeups)
+            self.sleeping -= 1
+
+    def wait(self, event, timeout, poll=1.0):
+        """Wait for `event` in virtual time, checking it every `poll` seconds"""
+        deadline = self.monotonic() + timeout
+        while not event.is_set() and not self.stopped:
+            remaining = deadline - self.monotonic()
+            if remaining <= 0:
+                break
+            self.sleep(min(remaining, poll))
+        return event.is_set()
+
+    def stop(self):
+        """Release every sleeper; later sleeps return immediately"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def _advance(self):
+        # Called with the lock held
+        if self.wakeups and self.sleeping >= self.participants:
+            self.elapsed = max(self.elapsed, self.wakeups[0])
+            self.condition.notify_all()
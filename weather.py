@@ -6,8 +6,14 @@ import sys
 import time
 from datetime import datetime
 import random
+import configparser
+from weather_provider import create_weather_service
+from weather_graph import WeatherGraph
+from control_server import Metrics, create_control_server
+from ambient_mix import create_ambient_bed
 
 run = True
+paused = False
 
 weekconv = {
     0: "Monday",
@@ -53,13 +59,40 @@ playlist = ["sounds/track1.mp3", "sounds/track2.mp3", "sounds/track3.mp3", "soun
 random.shuffle(playlist)
 
 background = ["sounds/rainforest.mp3", "sounds/wind.mp3"]
+background_sounds = []
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+def use_ambient_bed():
+    # Pre-mix finished: swap the layered channels for the single bed
+    global rain, background_sounds
+    for noise in background_sounds:
+        noise.fadeout(2000)
+    background_sounds = []
+    if rain and "rain" in ambient_bed.beds:
+        rain.fadeout(2000)
+        rain = None
+    ambient_bed.play(2000)
+
+# One pre-mixed looping bed per weather state instead of three live channels
+ambient_bed = create_ambient_bed(config, "sounds", log=print) if pygame.mixer.get_init() else None
+rain = None
 
+if ambient_bed and ambient_bed.load():
+    ambient_bed.play()
+    if "rain" not in ambient_bed.beds:
+        try:
+            rain = pygame.mixer.Sound("sounds/rain.wav")
+        except pygame.error as e:
+            print(f"Rain sound error: {e}")
 # Only try to play background sounds if mixer is initialized
-if pygame.mixer.get_init():
+elif pygame.mixer.get_init():
     for noise in background:
         try:
             noise = pygame.mixer.Sound(noise)
             noise.play(-1).set_volume(0.3)
+            background_sounds.append(noise)
         except pygame.error as e:
             print(f"Background sound error: {e}")
 
@@ -68,8 +101,9 @@ if pygame.mixer.get_init():
     except pygame.error as e:
         print(f"Rain sound error: {e}")
         rain = None
-else:
-    rain = None
+
+    if ambient_bed:
+        ambient_bed.build_in_background(on_ready=use_ambient_bed)
 
 baudrate = 9600
 historical = []
@@ -97,6 +131,91 @@ else:
 # Now properly initialize weather with the correct time_window
 weather = time_window
 
+# Real weather provider from config.ini (None keeps the random simulation)
+weather_service = create_weather_service(config)
+
+# Weather states and transition clips; the render loop advances transitions
+graph = WeatherGraph("wallpapers")
+transition_done = threading.Event()
+
+missing = graph.validate()
+if missing:
+    print("Missing wallpaper videos:")
+    for path in missing:
+        print(f"  {path}")
+
+def status():
+    return {
+        "weather": weather,
+        "time_window": time_window,
+        "paused": paused,
+        "real_weather": weather_service.condition() if weather_service else None,
+        "real_weather_state": weather_service.state(time_window) if weather_service else None
+    }
+
+def refresh_weather():
+    # Repeated requests before the fetch starts share one fetch
+    if not weather_service:
+        raise RuntimeError("No weather provider configured")
+    weather_service.request_refresh()
+    return status()
+
+def metrics_snapshot():
+    snapshot = metrics.snapshot()
+    snapshot.update(status())
+    return snapshot
+
+def force_weather(state):
+    global weather
+    if state not in graph.states:
+        raise ValueError(f"Unknown weather state: {state}")
+    # Transition clips only advance from the render loop's end-of-clip check
+    if graph.is_transition(state):
+        raise ValueError(f"Cannot force a transition clip: {state}")
+    weather = state
+    return status()
+
+def reload_config():
+    # Re-read config.ini and restart the real weather provider with it
+    global weather_service
+    config.read("config.ini")
+    old_service = weather_service
+    # Start the new service first so a waiting weather loop moves across
+    weather_service = create_weather_service(config)
+    if weather_service:
+        weather_service.start()
+    if old_service:
+        old_service.stop()
+    return status()
+
+def pause():
+    global paused
+    paused = True
+    if pygame.mixer.get_init():
+        pygame.mixer.pause()
+        pygame.mixer.music.pause()
+    return status()
+
+def resume():
+    global paused
+    paused = False
+    if pygame.mixer.get_init():
+        pygame.mixer.unpause()
+        pygame.mixer.music.unpause()
+    return status()
+
+# Live metrics and the optional control socket
+metrics = Metrics()
+control_server = create_control_server(config, {
+    "status": status,
+    "metrics": metrics_snapshot,
+    "force": force_weather,
+    "pause": pause,
+    "resume": resume,
+    "reload": reload_config,
+    "refresh": refresh_weather
+})
+
 def avg(l):
     return sum(l) / len(l)
 
@@ -124,43 +243,93 @@ def music():
             print(f"Music playback error: {e}")
             time.sleep(1)  # Wait before trying again
 
+def wait_for_weather(raining, fallback):
+    deadline = time.monotonic() + fallback
+    while run:
+        service = weather_service
+        remaining = max(0, deadline - time.monotonic())
+        if not service:
+            time.sleep(remaining)
+            return
+        # A reload swaps the service; keep waiting on the new one
+        result = service.wait_for(raining, remaining,
+                                  should_run=lambda: run and weather_service is service)
+        if result is not None:
+            return
+
+def wait_for_transition():
+    # Set by the render loop when the transition clip plays to its end,
+    # or skipped when a forced state replaced the transition
+    while run and graph.is_transition(weather) and not transition_done.wait(0.25):
+        pass
+
+def wait_while_paused():
+    while paused and run:
+        time.sleep(0.5)
+
 def weather_loop():
     global weather, old_weather, time_window, run
     while run:
-
-        weather = f"{time_window}_to_rain"
-        if rain:
-            rain.set_volume(0)
-            rain.play(-1)
-
+        # With real weather, stay clear until it actually rains
+        if weather_service:
+            wait_for_weather(True, 0)
+        wait_while_paused()
+
+        transition_done.clear()
+        weather = graph.to_rain(time_window)
+        if ambient_bed:
+            ambient_bed.set_state(True, 5000)
+
+        # Local reference: the pre-mix may replace the rain channel meanwhile
+        rain_sound = rain
+        if rain_sound:
+            rain_sound.set_volume(0)
+            rain_sound.play(-1)
+
+        rain_volume = config.getfloat('AUDIO', 'rain_volume', fallback=0.5)
         for i in range(0, 20):
-            if rain:
-                rain.set_volume((1 / 40) * i)
+            if rain_sound:
+                rain_sound.set_volume(rain_volume / 20 * (i + 1))
             time.sleep(0.25)
-        time.sleep(8)
-
-        weather = f"{time_window}_rain"  # Use time-specific rain videos
+        wait_for_transition()
 
-        time.sleep(random.randint(0, 60 * 5))
+        wait_for_weather(False, random.randint(0, 60 * 5))
+        wait_while_paused()
 
-        weather = f"rain_to_{time_window}"
+        transition_done.clear()
+        weather = graph.to_clear(time_window)
+        if ambient_bed:
+            ambient_bed.set_state(False, 5000)
 
+        rain_sound = rain
+        rain_volume = config.getfloat('AUDIO', 'rain_volume', fallback=0.5)
         for i in range(0, 20):
-            if rain:
-                rain.set_volume((1 / 40) * (20 - i))
+            if rain_sound:
+                rain_sound.set_volume(rain_volume / 20 * (19 - i))
             time.sleep(0.25)
-        time.sleep(8)
-        if rain:
-            rain.stop()
+        wait_for_transition()
+        if rain_sound:
+            rain_sound.stop()
 
-        weather = time_window
+        # Pick up any time window change that happened while it rained
+        weather = graph.clear_state(time_window)
 
-        time.sleep(random.randint(0, 60 * 5))
+        wait_for_weather(True, random.randint(0, 60 * 5))
 
 
 
 if __name__ == '__main__':
 
+    # Fetch real weather off the render thread
+    if weather_service:
+        weather_service.start()
+
+    if control_server:
+        try:
+            control_server.start()
+        except OSError as e:
+            print(f"Control server error: {e}")
+
     # Start background threads as daemon threads so they exit when main exits
     weather_thread = threading.Thread(target=weather_loop)
     weather_thread.daemon = True
@@ -170,6 +339,8 @@ if __name__ == '__main__':
     music_thread.daemon = True
     music_thread.start()
 
+    last_flip = time.perf_counter()
+
     try:
         while run:
             local_time = time.localtime()
@@ -182,7 +353,7 @@ if __name__ == '__main__':
 
             if not old_weather == weather:
 
-                video = cv2.VideoCapture(f"wallpapers/{weather}.mov")
+                video = cv2.VideoCapture(graph.path(weather))
                 old_weather = weather
 
             clock.tick(30)
@@ -208,8 +379,14 @@ if __name__ == '__main__':
                 # Scale the video to fit the screen
                 video_surf = pygame.transform.scale(video_surf, (width, height))
             else:
+                # Transition clips advance to their target state as soon as they end
+                if graph.is_transition(weather):
+                    weather = graph.advance(weather)
+                    old_weather = weather
+                    transition_done.set()
+
                 # Video ended, restart it and read the first frame
-                video = cv2.VideoCapture(f"wallpapers/{weather}.mov")
+                video = cv2.VideoCapture(graph.path(weather))
                 success, video_image = video.read()
                 if success:
                     video_surf = pygame.image.frombuffer(video_image.tobytes(), video_image.shape[1::-1], "BGR")
@@ -232,6 +409,10 @@ if __name__ == '__main__':
             window.blit(text, (width / 2 - text.get_width() / 2, height / 2 - 50))
 
             pygame.display.flip()
+
+            now = time.perf_counter()
+            metrics.record_frame(now - last_flip)
+            last_flip = now
             
     except KeyboardInterrupt:
         print("\nKeyboard interrupt received. Shutting down...")
@@ -0,0 +1,149 @@
+import json
+import os
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+TIME_WINDOWS = ("morning", "day", "evening", "night")
+
+
+class WeatherGraph:
+    """Precomputed weather states, transitions, clip paths and clip durations
+
+    Every time window has two looping states ("{tw}" and "{tw}_rain") joined
+    by two one-shot transition clips ("{tw}_to_rain" and "rain_to_{tw}").
+    """
+
+    def __init__(self, wallpaper_dir="wallpapers", extension=".mov",
+                 duration_cache="clip_durations.json", default_duration=8.0):
+        self.wallpaper_dir = wallpaper_dir
+        self.extension = extension
+        self.duration_cache = duration_cache
+        self.default_duration = default_duration
+        self.states = {}
+        self.durations = {}
+
+        for tw in TIME_WINDOWS:
+            self._add_state(tw, tw, raining=False)
+            self._add_state(f"{tw}_rain", tw, raining=True)
+            self._add_state(f"{tw}_to_rain", tw, raining=True, next_state=f"{tw}_rain")
+            self._add_state(f"rain_to_{tw}", tw, raining=False, next_state=tw)
+
+        self._load_durations()
+
+    def _add_state(self, name, time_window, raining, next_state=None):
+        self.states[name] = {
+            "time_window": time_window,
+            "raining": raining,
+            "transition": next_state is not None,
+            "next": next_state,
+            "path": os.path.abspath(os.path.join(self.wallpaper_dir, f"{name}{self.extension}"))
+        }
+
+    # State lookups
+
+    def clear_state(self, time_window):
+        return time_window
+
+    def rain_state(self, time_window):
+        return f"{time_window}_rain"
+
+    def to_rain(self, time_window):
+        return f"{time_window}_to_rain"
+
+    def to_clear(self, time_window):
+        return f"rain_to_{time_window}"
+
+    def is_transition(self, name):
+        state = self.states.get(name)
+        return bool(state and state["transition"])
+
+    def is_raining(self, name):
+        state = self.states.get(name)
+        return bool(state and state["raining"])
+
+    def is_clear(self, name):
+        """True for the looping clear-sky states"""
+        state = self.states.get(name)
+        return bool(state and not state["transition"] and not state["raining"])
+
+    def advance(self, name):
+        """State to show once the transition clip `name` has finished"""
+        state = self.states.get(name)
+        if state and state["transition"]:
+            return state["next"]
+        return name
+
+    def path(self, name):
+        state = self.states.get(name)
+        if state:
+            return state["path"]
+        return os.path.abspath(os.path.join(self.wallpaper_dir, f"{name}{self.extension}"))
+
+    def validate(self):
+        """Return the asset paths referenced by the graph that are missing"""
+        return [state["path"] for state in self.states.values()
+                if not os.path.exists(state["path"])]
+
+    # Clip durations
+
+    def duration(self, name):
+        """Length of the clip for `name` in seconds, probed once and cached"""
+        path = self.path(name)
+        key = self._duration_key(path)
+        if key is None:
+            return self.default_duration
+        if key not in self.durations:
+            probed = self._probe(path)
+            if probed is None:
+                return self.default_duration
+            self.durations[key] = probed
+            self._save_durations()
+        return self.durations[key]
+
+    def probe_all(self):
+        """Probe every transition clip up front so later lookups are free"""
+        for name, state in self.states.items():
+            if state["transition"]:
+                self.duration(name)
+
+    def _duration_key(self, path):
+        # Include size and mtime so re-exported clips are probed again
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return f"{path}|{stat.st_size}|{int(stat.st_mtime)}"
+
+    def _probe(self, path):
+        if cv2 is None:
+            return None
+        video = cv2.VideoCapture(path)
+        try:
+            frames = video.get(cv2.CAP_PROP_FRAME_COUNT)
+            fps = video.get(cv2.CAP_PROP_FPS)
+        finally:
+            video.release()
+        if frames > 0 and fps > 0:
+            return frames / fps
+        return None
+
+    def _load_durations(self):
+        if not self.duration_cache or not os.path.exists(self.duration_cache):
+            return
+        try:
+            with open(self.duration_cache, "r", encoding="utf-8") as f:
+                self.durations = {key: float(value) for key, value in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            self.durations = {}
+
+    def _save_durations(self):
+        if not self.duration_cache:
+            return
+        try:
+            with open(self.duration_cache, "w", encoding="utf-8") as f:
+                json.dump(self.durations, f, indent=2)
+        except OSError:
+            pass
@@ -0,0 +1,351 @@
+import json
+import os
+import sys
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from virtual_clock import SystemClock
+
+# Conditions that are shown with the "{time_window}_rain" wallpapers
+RAIN_CONDITIONS = {
+    "rain", "drizzle", "showers", "shower", "thunderstorm", "storm", "sleet"
+}
+
+
+def extract_condition(payload):
+    """Pull a lowercase condition string out of a provider response"""
+    if isinstance(payload, dict):
+        if "condition" in payload:
+            return str(payload["condition"]).strip().lower()
+        # OpenWeatherMap style: {"weather": [{"main": "Rain"}]}
+        entries = payload.get("weather")
+        if isinstance(entries, list) and entries and isinstance(entries[0], dict):
+            return str(entries[0].get("main", "")).strip().lower()
+    raise ValueError(f"No weather condition in response: {payload!r}")
+
+
+def is_rain_condition(condition):
+    """Check whether a condition should be displayed as rain"""
+    return condition in RAIN_CONDITIONS
+
+
+def weather_state(condition, time_window):
+    """Map a real-world condition onto an existing wallpaper state"""
+    if is_rain_condition(condition):
+        return f"{time_window}_rain"
+    return time_window
+
+
+class WeatherProvider:
+    """Base class for real weather backends"""
+
+    def key(self):
+        """Identifier used for cache entries"""
+        raise NotImplementedError
+
+    def fetch(self):
+        """Return the current condition string, raising on failure"""
+        raise NotImplementedError
+
+
+class FileWeatherProvider(WeatherProvider):
+    """Read conditions from a local JSON file, e.g. {"condition": "rain"}"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def key(self):
+        return f"file:{os.path.abspath(self.path)}"
+
+    def fetch(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return extract_condition(json.load(f))
+
+
+class HttpWeatherProvider(WeatherProvider):
+    """Fetch conditions as JSON from an HTTP endpoint"""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def key(self):
+        return f"http:{self.url}"
+
+    def fetch(self):
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            return extract_condition(json.loads(response.read().decode("utf-8")))
+
+
+class WeatherCache:
+    """TTL cache of provider responses, persisted to a JSON file"""
+
+    def __init__(self, path=None, ttl=600, max_age=3600, clock=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.clock = clock or SystemClock()
+        self.entries = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = {
+                key: (entry["condition"], float(entry["fetched_at"]))
+                for key, entry in data.items()
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            # A corrupt cache only costs one extra fetch
+            self.entries = {}
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {
+            key: {"condition": condition, "fetched_at": fetched_at}
+            for key, (condition, fetched_at) in self.entries.items()
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def _time(self):
+        return self.clock.now().timestamp()
+
+    def get(self, key):
+        """Return (condition, is_fresh), or (None, False) if missing or too old"""
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None, False
+        condition, fetched_at = entry
+        age = self._time() - fetched_at
+        if age > self.max_age:
+            return None, False
+        return condition, age < self.ttl
+
+    def age(self, key):
+        """Seconds since the entry was fetched, or None if missing"""
+        with self.lock:
+            entry = self.entries.get(key)
+        return None if entry is None else self._time() - entry[1]
+
+    def put(self, key, condition):
+        with self.lock:
+            self.entries[key] = (condition, self._time())
+            self._save()
+
+
+class WeatherService:
+    """Fetch weather on a background thread so callers never block on I/O"""
+
+    def __init__(self, provider, cache, refresh_interval=300, retry_delay=15,
+                 max_backoff=1800, first_fetch_timeout=5, clock=None, log=None):
+        self.provider = provider
+        self.cache = cache
+        self.refresh_interval = refresh_interval
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.first_fetch_timeout = first_fetch_timeout
+        self.clock = clock or SystemClock()
+        self.log = log or (lambda message: None)
+        self.run = False
+        self.failures = 0
+        self.thread = None
+        self._wake = threading.Event()
+        self._refresh_requested = threading.Event()
+        self._first_fetch = threading.Event()
+        self._fetch_lock = threading.Lock()
+        # One event per blocked wait_for call, set when the data changes
+        self._waiters = set()
+        self._waiters_lock = threading.Lock()
+
+    def start(self):
+        """Start the background fetch thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.run = True
+        self.thread = self.clock.spawn(self._worker)
+
+    def stop(self):
+        self.run = False
+        self._wake.set()
+        self._first_fetch.set()
+        self._notify()
+
+    def _notify(self):
+        with self._waiters_lock:
+            for changed in self._waiters:
+                changed.set()
+
+    def request_refresh(self):
+        """Ask for a fetch now; requests made before it starts share one fetch"""
+        self._refresh_requested.set()
+        self._wake.set()
+
+    def condition(self):
+        """Latest known condition (possibly stale), or None without data"""
+        condition, _ = self.cache.get(self.provider.key())
+        return condition
+
+    def is_raining(self):
+        """True/False from real data, or None when no usable data exists"""
+        condition = self.condition()
+        return None if condition is None else is_rain_condition(condition)
+
+    def state(self, time_window):
+        """Wallpaper state for the real weather, or None without data"""
+        condition = self.condition()
+        return None if condition is None else weather_state(condition, time_window)
+
+    def wait_for(self, raining, fallback, should_run=None):
+        """Block until real conditions match `raining`.
+
+        Without usable data this degrades to sleeping `fallback` seconds, which
+        keeps the original random weather timer as the default behaviour.
+        Returns True if real data triggered the change, False when the fallback
+        expired, or None if the service was stopped or `should_run` turned false.
+        """
+        # Cold start: let the first fetch finish before trusting the timer
+        if self.is_raining() is None:
+            self.clock.wait(self._first_fetch, self.first_fetch_timeout)
+        deadline = self.clock.monotonic() + fallback
+        changed = threading.Event()
+        with self._waiters_lock:
+            self._waiters.add(changed)
+        try:
+            while self.run and (should_run is None or should_run()):
+                # Clear before checking so a change made meanwhile isn't missed
+                changed.clear()
+                current = self.is_raining()
+                if current is not None:
+                    if current == raining:
+                        return True
+                    self.clock.wait(changed, 1.0)
+                    continue
+                remaining = deadline - self.clock.monotonic()
+                if remaining <= 0:
+                    return False
+                self.clock.wait(changed, min(remaining, 1.0))
+            return None
+        finally:
+            with self._waiters_lock:
+                self._waiters.discard(changed)
+
+    def _next_delay(self):
+        if self.failures:
+            # Exponential backoff while the provider keeps failing
+            return min(self.retry_delay * 2 ** (self.failures - 1), self.max_backoff)
+        age = self.cache.age(self.provider.key())
+        if age is None:
+            return 0
+        return max(0, min(self.refresh_interval, self.cache.ttl - age))
+
+    def _fetch(self):
+        try:
+            # Only one fetch in flight at a time
+            with self._fetch_lock:
+                _, fresh = self.cache.get(self.provider.key())
+                if fresh and not self.failures and not self._refresh_requested.is_set():
+                    return
+                self._refresh_requested.clear()
+                try:
+                    condition = self.provider.fetch()
+                except Exception as e:
+                    self.failures += 1
+                    self.log(f"Weather fetch failed ({self.failures}): {e}")
+                    return
+                previous = self.condition()
+                self.failures = 0
+                self.cache.put(self.provider.key(), condition)
+                if condition != previous:
+                    self.log(f"Real weather: {condition}")
+            self._notify()
+        finally:
+            # Waiters blocked on a cold start may now fall back to the timer
+            self._first_fetch.set()
+
+    def _worker(self):
+        while self.run:
+            self._wake.clear()
+            self._fetch()
+            self.clock.wait(self._wake, max(self._next_delay(), 1))
+
+
+def create_weather_service(config, base_dir=".", clock=None, log=None):
+    """Build a WeatherService from the [WEATHER] config section, or None if disabled"""
+    provider_name = config.get('WEATHER', 'provider', fallback='none').strip().lower()
+    if provider_name == 'file':
+        path = os.path.join(base_dir, config.get('WEATHER', 'file_path', fallback='weather.json'))
+        provider = FileWeatherProvider(path)
+    elif provider_name == 'http':
+        provider = HttpWeatherProvider(
+            config.get('WEATHER', 'url', fallback='http://127.0.0.1:8765/weather'),
+            timeout=config.getfloat('WEATHER', 'request_timeout', fallback=5.0)
+        )
+    else:
+        return None
+
+    cache_file = config.get('WEATHER', 'cache_file', fallback='weather_cache.json')
+    cache = WeatherCache(
+        os.path.join(base_dir, cache_file) if cache_file else None,
+        ttl=config.getint('WEATHER', 'cache_ttl', fallback=600),
+        max_age=config.getint('WEATHER', 'max_cache_age', fallback=3600),
+        clock=clock
+    )
+    return WeatherService(
+        provider,
+        cache,
+        refresh_interval=config.getint('WEATHER', 'refresh_interval', fallback=300),
+        retry_delay=config.getint('WEATHER', 'retry_delay', fallback=15),
+        max_backoff=config.getint('WEATHER', 'max_backoff', fallback=1800),
+        first_fetch_timeout=config.getfloat('WEATHER', 'first_fetch_timeout', fallback=5.0),
+        clock=clock,
+        log=log
+    )
+
+
+def serve_stand_in(path="weather.json", port=8765):
+    """Serve a local JSON file over HTTP as a stand-in weather API"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            try:
+                with open(path, "rb") as f:
+                    body = f.read()
+                self.send_response(200)
+            except OSError:
+                body = b'{"condition": "clear"}'
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving {path} at http://127.0.0.1:{port}/weather (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # Usage: python weather_provider.py [weather.json] [port]
+    serve_stand_in(
+        sys.argv[1] if len(sys.argv) > 1 else "weather.json",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    )